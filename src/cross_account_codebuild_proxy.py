@@ -15,43 +15,188 @@
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import boto3  # type: ignore
-import logging
-import sys
-import traceback
 import os
-import json
-from botocore.exceptions import ClientError
+from dataclasses import dataclass, field, fields
+from botocore.client import BaseClient
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
+from botocore.exceptions import BotoCoreError, ClientError
+from botocore.session import get_session
 from aws_lambda_powertools import Tracer # type: ignore
 from aws_lambda_powertools import Logger # type: ignore
 
-sts_client = boto3.client('sts')
+# Shared client config, keeps connections alive so warm invocations avoid new TLS handshakes
+BOTO_CFG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+
+# Use the regional STS endpoint for the Lambda's own region rather than the global endpoint
+lambda_region = os.environ['AWS_REGION']
+sts_botocore_session = get_session()
+sts_botocore_session.set_config_variable('sts_regional_endpoints', 'regional')
+sts_client = boto3.Session(botocore_session=sts_botocore_session).client(
+    'sts',
+    region_name=lambda_region,
+    config=BOTO_CFG
+)
 tracer = Tracer(service="code-build-proxy")
 logger = Logger(service="code-build-proxy")
 
+# Assumed role sessions are reused across warm invocations, botocore refreshes their credentials on expiry
+SESSION_DURATION_SECONDS = 3600
+_SESSION_CACHE: dict[str, boto3.Session] = {}
+_CB_CLIENTS: dict[tuple[str, str], BaseClient] = {}
+
+# Role and region used when an event does not supply a roleArn or region, resolved once at init.
+# Each is only applied when explicitly configured, so multi-region callers still get a missing region error
+DEFAULT_ROLE_ARN = os.environ.get('ROLE_ARN')
+DEFAULT_REGION = os.environ.get('CODEBUILD_REGION')
+
+# Maximum number of build IDs accepted by a single CodeBuild BatchGetBuilds call
+BATCH_GET_BUILDS_LIMIT = 100
+
+@dataclass(frozen=True, slots=True)
+class StartEvent:
+    """
+    Fields of a START_BUILD invocation event
+    """
+    roleArn: str | None
+    codeBuildProject: str | None
+    region: str | None
+    environmentVariables: list = field(default_factory=list)
+
+@dataclass(frozen=True, slots=True)
+class StatusEvent:
+    """
+    Fields of a CHECK_STATUS invocation event
+    """
+    roleArn: str | None
+    region: str | None
+    jobId: str | None = None
+    jobIds: list | None = None
+
+# Event fields which must be supplied, or configured as a default, for each invocationType
+_REQ_START = ('roleArn', 'codeBuildProject', 'region')
+_REQ_STATUS = ('roleArn', 'region')
+
+def parse_event(event_type: type, event: dict):
+    """
+    Parse the supplied Lambda event into an event dataclass in a single pass
+
+    Parameters:
+        event_type (type): the event dataclass to parse into
+        event (dict): the supplied Lambda event
+
+    Returns:
+        the parsed event dataclass, with None for any field missing from the event
+    """
+    parsed = {f.name: event.get(f.name) for f in fields(event_type)}
+    parsed['roleArn'] = parsed['roleArn'] or DEFAULT_ROLE_ARN
+    parsed['region'] = parsed['region'] or DEFAULT_REGION
+    if 'environmentVariables' in parsed and not parsed['environmentVariables']:
+        parsed['environmentVariables'] = []
+    return event_type(**parsed)
+
+def validate_event(parsed_event, required: tuple):
+    """
+    Check the parsed event includes every required field, reporting all missing fields at once
+
+    Parameters:
+        parsed_event: the parsed event dataclass
+        required (tuple): the names of the fields which must be set
+    """
+    missing = [k for k in required if not getattr(parsed_event, k)]
+    if missing:
+        raise ValueError(f"Event did not include the required fields: {missing}")
+
 @tracer.capture_method
-def assume_role(role_arn: str):
+def fetch_role_credentials(role_arn: str):
     """
-    Function to assume an IAM Role
+    Call STS to assume an IAM Role
     
     Parameters: 
         role_arn (str): the ARN of the role to assume
     
     Returns:
-        boto3 session object
+        credentials (dict): the role credentials in the format expected by botocore RefreshableCredentials
     """
     try:
-        logger.info(f"Assuming Role: {role_arn}")
+        logger.info("Assuming Role: %s", role_arn)
         assumedRole = sts_client.assume_role(
             RoleArn=role_arn,
-            RoleSessionName='cross_account_role'
+            RoleSessionName='cross_account_role',
+            DurationSeconds=SESSION_DURATION_SECONDS
         )
-    except:
+    except (BotoCoreError, ClientError):
         logger.exception("Failed to assume role")  
         raise RuntimeError(f"Could not assume role: {role_arn}")
-    return boto3.Session(
-        aws_access_key_id=assumedRole['Credentials']['AccessKeyId'],
-        aws_secret_access_key=assumedRole['Credentials']['SecretAccessKey'],
-        aws_session_token=assumedRole['Credentials']['SessionToken'])
+    return {
+        'access_key': assumedRole['Credentials']['AccessKeyId'],
+        'secret_key': assumedRole['Credentials']['SecretAccessKey'],
+        'token': assumedRole['Credentials']['SessionToken'],
+        'expiry_time': assumedRole['Credentials']['Expiration'].isoformat()
+    }
+
+def assume_role(role_arn: str):
+    """
+    Function to assume an IAM Role, returning a cached session whose credentials refresh automatically
+    
+    Parameters: 
+        role_arn (str): the ARN of the role to assume
+    
+    Returns:
+        boto3 session object
+    """
+    session = _SESSION_CACHE.get(role_arn)
+    if session:
+        # cache hits are annotated on the current segment rather than traced as their own subsegment
+        tracer.put_annotation(key="SessionCache", value="hit")
+        logger.info("Reusing cached session for Role: %s", role_arn)
+        return session
+
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata=fetch_role_credentials(role_arn),
+        refresh_using=lambda: fetch_role_credentials(role_arn),
+        method='sts-assume-role'
+    )
+    botocore_session = get_session()
+    botocore_session._credentials = credentials
+    session = boto3.Session(botocore_session=botocore_session)
+    _SESSION_CACHE[role_arn] = session
+    return session
+
+def get_codebuild_client(role_arn: str, region: str):
+    """
+    Function to get a CodeBuild client for an IAM Role and region, reusing a cached client where available
+    
+    Parameters: 
+        role_arn (str): the ARN of the role to assume
+        region (str): the region of the target CodeBuild Project
+    
+    Returns:
+        boto3 CodeBuild client object
+    """
+    codebuild_client = _CB_CLIENTS.get((role_arn, region))
+    if codebuild_client is not None:
+        # warm invocations return here without reaching assume_role, so annotate the client cache hit
+        tracer.put_annotation(key="ClientCache", value="hit")
+        logger.info("Reusing cached CodeBuild client for Role: %s in region: %s", role_arn, region)
+        return codebuild_client
+
+    boto3_session = assume_role(role_arn)
+    codebuild_client = boto3_session.client('codebuild', region_name=region, config=BOTO_CFG)
+    _CB_CLIENTS[(role_arn, region)] = codebuild_client
+    return codebuild_client
+
+# Pre-warm the session and CodeBuild client during Lambda init when a single target role is configured,
+# multi-role deployments fall back to populating the caches on first use
+if DEFAULT_ROLE_ARN:
+    try:
+        get_codebuild_client(DEFAULT_ROLE_ARN, DEFAULT_REGION or lambda_region)
+    except RuntimeError:
+        logger.warning("Could not pre-warm the CodeBuild client during init")
 
 @tracer.capture_method
 def start_codebuild_project(codebuild_session_object, codebuild_project: str, codebuild_envvars: list):
@@ -71,36 +216,44 @@ def start_codebuild_project(codebuild_session_object, codebuild_project: str, co
                             projectName=codebuild_project,
                             environmentVariablesOverride=codebuild_envvars
                         )
-    except:
-        logger.exception(f"Failed to start CodeBuild Project: {codebuild_project}")     
+    except (BotoCoreError, ClientError):
+        logger.exception("Failed to start CodeBuild Project: %s", codebuild_project)     
         raise RuntimeError(f"Could not start CodeBuild Project: {codebuild_project}")
 
-    logger.info(f"Started CodeBuild Job: {codebuild_response['build']['id']}")
+    logger.info("Started CodeBuild Job: %s", codebuild_response['build']['id'])
     return {
         'codeBuildJobId': codebuild_response['build']['id']
     }  
 
 @tracer.capture_method
-def check_codebuild_status(codebuild_session_object, codebuild_job_id):
+def check_codebuild_status(codebuild_session_object, codebuild_job_ids: list):
     """
-    Check the status of the supplied CodeBuild Job ID
+    Check the status of the supplied CodeBuild Job IDs
     
     Parameters:
         codebuild_session_object: boto3 session object
-        codebuild_job_id (str): the CodeBuild execution ID to check
+        codebuild_job_ids (list): the CodeBuild execution IDs to check
 
     Returns:
-        job_status (str): the build status of the CodeBuild exection
+        job_statuses (list): the id and buildStatus of each CodeBuild execution
     """
-    try:
-        codebuild_response = codebuild_session_object.batch_get_builds(
-                                ids=[codebuild_job_id]
-                            )
-    except:
-        logger.exception(f"Failed to check job status: {codebuild_job_id}") 
-        raise RuntimeError(f"Exception checking job status: {codebuild_job_id}")
-    job_status = codebuild_response['builds'][0]['buildStatus']
-    return job_status
+    job_statuses = []
+    for i in range(0, len(codebuild_job_ids), BATCH_GET_BUILDS_LIMIT):
+        batch = codebuild_job_ids[i:i + BATCH_GET_BUILDS_LIMIT]
+        try:
+            codebuild_response = codebuild_session_object.batch_get_builds(
+                                    ids=batch
+                                )
+        except (BotoCoreError, ClientError):
+            logger.exception("Failed to check job status: %s", batch) 
+            raise RuntimeError(f"Exception checking job status: {batch}")
+        if codebuild_response.get('buildsNotFound'):
+            raise RuntimeError(f"CodeBuild Jobs not found: {codebuild_response['buildsNotFound']}")
+        job_statuses.extend(
+            {'id': build['id'], 'buildStatus': build['buildStatus']}
+            for build in codebuild_response['builds']
+        )
+    return job_statuses
 
 @tracer.capture_method
 def start_build_handler(event):
@@ -113,18 +266,13 @@ def start_build_handler(event):
     Returns:
         event (dict): The Lambda event object
     """
-    if not event['roleArn']:
-        raise Exception("Event did not include the roleArn")
-    if not event['codeBuildProject']:
-        raise Exception("Event did not include the target CodeBuild Project")
-    if not event['environmentVariables']:
-        event['environmentVariables'] = []
+    logger.info("Starting CodeBuild Project")
+    start_event = parse_event(StartEvent, event)
+    validate_event(start_event, _REQ_START)
 
-    boto3_session = assume_role(event['roleArn'])
-    codebuild_client = boto3_session.client('codebuild')
-
-    codebuild_start = start_codebuild_project(codebuild_client, event['codeBuildProject'], event['environmentVariables'])
-    logger.info(f"CodeBuild Job started successfully, ID: {codebuild_start['codeBuildJobId']}")
+    codebuild_client = get_codebuild_client(start_event.roleArn, start_event.region)
+    codebuild_start = start_codebuild_project(codebuild_client, start_event.codeBuildProject, start_event.environmentVariables)
+    logger.info("CodeBuild Job started successfully, ID: %s", codebuild_start['codeBuildJobId'])
 
     # append CodeBuild Job Id to the supplied event
     event.update({"CodeBuildJobStatus": "IN_PROGRESS"})
@@ -134,7 +282,10 @@ def start_build_handler(event):
 @tracer.capture_method
 def check_build_status_handler(event):
     """
-    Function to check the status of a CodeBuild Job ID
+    Function to check the status of a CodeBuild Job ID, or a list of CodeBuild Job IDs
+
+    A single jobId sets CodeBuildJobStatus on the event, a list of jobIds sets
+    CodeBuildJobStatuses to the id and buildStatus of each job.
 
     Parameters:
         event (dict): the supplied Lambda event
@@ -142,22 +293,38 @@ def check_build_status_handler(event):
     Returns:
         event (dict): The Lambda event object
     """
-    if not event['roleArn']:
-        raise Exception("Event did not include the roleArn")
-    if not event['jobId']:
-        raise Exception("Event did not include the CodeBuild ID to check")
+    logger.info("Checking CodeBuild Job Status")
+    status_event = parse_event(StatusEvent, event)
+    validate_event(status_event, _REQ_STATUS)
+    if not status_event.jobId and not status_event.jobIds:
+        raise ValueError("Event did not include the CodeBuild ID to check")
+    if status_event.jobIds and not isinstance(status_event.jobIds, list):
+        raise ValueError("Event jobIds must be a list of CodeBuild IDs")
 
-    boto3_session = assume_role(event['roleArn'])
-    codebuild_client = boto3_session.client('codebuild')
+    codebuild_client = get_codebuild_client(status_event.roleArn, status_event.region)
 
-    codebuild_status = check_codebuild_status(codebuild_client, event['jobId'])
-    logger.info(f"CodeBuild Job Status: {codebuild_status}")
+    if status_event.jobIds:
+        codebuild_statuses = check_codebuild_status(codebuild_client, status_event.jobIds)
+        logger.info("CodeBuild Job Statuses: %s", codebuild_statuses)
+
+        # append CodeBuild Job statuses to the supplied event
+        event.update({"CodeBuildJobStatuses": codebuild_statuses})
+        return event
+
+    codebuild_status = check_codebuild_status(codebuild_client, [status_event.jobId])[0]['buildStatus']
+    logger.info("CodeBuild Job Status: %s", codebuild_status)
 
     # append CodeBuild Job Id to the supplied event
     event.update({"CodeBuildJobStatus": codebuild_status})
-    event.update({"CodeBuildJobId": event['jobId']})
+    event.update({"CodeBuildJobId": status_event.jobId})
     return event
 
+# Handler for each supported invocationType
+_DISPATCH = {
+    "START_BUILD": start_build_handler,
+    "CHECK_STATUS": check_build_status_handler
+}
+
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context(log_event=True)
 def lambda_handler(event, context):
@@ -175,9 +342,8 @@ def lambda_handler(event, context):
     Returns:
         event (dict): The updated event object
     """
-    if event['invocationType'] == "START_BUILD":
-        logger.info("Starting CodeBuild Project")
-        return start_build_handler(event)
-    if event['invocationType'] == "CHECK_STATUS":
-        logger.info("Checking CodeBuild Job Status")
-        return check_build_status_handler(event)
\ No newline at end of file
+    invocation_type = event.get('invocationType')
+    handler = _DISPATCH.get(invocation_type) if isinstance(invocation_type, str) else None
+    if handler is None:
+        raise ValueError(f"Unsupported invocationType: {invocation_type}")
+    return handler(event)
\ No newline at end of file